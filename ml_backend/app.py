@@ -19,28 +19,39 @@ This rewritten version:
 
 import os
 import io
+import re
 import json
 import base64
+import hashlib
 import tempfile
+import threading
 import traceback
 import logging
+import functools
+import importlib.metadata
+import importlib.util
+import inspect
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
-from flask import Flask, request, jsonify
+from flask import Flask, request
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from PIL import Image
-import cv2
-import numpy as np
 
-# Try importing google-genai in a couple of ways for robustness
+# cv2, google-genai, PyAV and TurboJPEG are imported lazily (see _get_client,
+# _get_turbo and the video path): /health and image-only requests never pay
+# their import time or memory
+
+# diskcache is optional; enables the on-disk per-URL response cache
 try:
-    from google import genai
+    import diskcache
 except Exception:
-    try:
-        import google_genai as genai
-    except Exception:
-        genai = None
+    diskcache = None
 
 # ---------------- CONFIG ----------------
 from dotenv import load_dotenv
@@ -52,7 +63,20 @@ MODEL = os.getenv("MODEL", "gemini-2.5-flash")  # default if not found
 API_KEY = os.getenv("API_KEY")
 FRAME_SAMPLING_SECONDS = int(os.getenv("FRAME_SAMPLING_SECONDS", "2"))
 MAX_TAGS = int(os.getenv("MAX_TAGS", "12"))
+FRAME_MAX_DIM = int(os.getenv("FRAME_MAX_DIM", "768"))  # Gemini downsamples to ~768px anyway
 PORT = int(os.getenv("PORT", "5000"))
+URL_WORKERS = int(os.getenv("URL_WORKERS", "16"))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", "/tmp/gemini_cache")  # empty disables
+RESPONSE_CACHE_BYTES = int(os.getenv("RESPONSE_CACHE_BYTES", str(2 << 30)))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+GEMINI_WORKERS = int(os.getenv("GEMINI_WORKERS", "8"))  # parallel frame calls per video
+GEMINI_BATCH_SIZE = int(os.getenv("GEMINI_BATCH_SIZE", "8"))  # frames per Gemini request (1 = per frame)
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))  # process-wide cap (quota)
+USE_PYAV = os.getenv("USE_PYAV", "0") in ("1", "true", "True")
+PYAV_KEYFRAME_ONLY_SECONDS = int(os.getenv("PYAV_KEYFRAME_ONLY_SECONDS", "4"))  # decode keyframes only at/above this interval
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
+MAX_VIDEO_BYTES = int(os.getenv("MAX_VIDEO_BYTES", str(200 * 1024 * 1024)))
 VIDEO_EXTS = (".mp4", ".mov", ".mkv", ".webm", ".avi")
 
 # ---------------- Logging ----------------
@@ -60,10 +84,18 @@ logging.basicConfig(level=logging.INFO)
 log = logging.getLogger("app")
 
 # ---------------- Initialize client ----------------
-client = None
-if genai is None:
-    log.warning("google-genai SDK not installed or not importable. Install `google-genai`.")
-else:
+@functools.lru_cache(maxsize=1)
+def _get_client():
+    """Import google-genai and build the client on first use; None if unavailable."""
+    # Try importing google-genai in a couple of ways for robustness
+    try:
+        from google import genai
+    except Exception:
+        try:
+            import google_genai as genai
+        except Exception:
+            log.warning("google-genai SDK not installed or not importable. Install `google-genai`.")
+            return None
     try:
         if API_KEY:
             client = genai.Client(api_key=API_KEY)
@@ -71,45 +103,239 @@ else:
             # rely on ADC if available
             client = genai.Client()
         log.info("GenAI client initialized")
+        return client
     except Exception:
         log.exception("Failed to create GenAI client")
-        client = None
+        return None
+
+
+# PyAV (FFmpeg bindings) is optional; only located here, and imported by the
+# video sampler, so workers without USE_PYAV never load the FFmpeg libraries
+_PYAV_AVAILABLE = USE_PYAV and importlib.util.find_spec("av") is not None
+
+if USE_PYAV and not _PYAV_AVAILABLE:
+    log.warning("USE_PYAV is set but PyAV is not importable; falling back to OpenCV decode. Install `av`.")
+
+# ---------------- HTTP session ----------------
+# One pooled keep-alive session for all downloads: repeat hosts (CDNs) skip the TCP+TLS handshake.
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504]),
+)
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
 
 # ---------------- Utilities ----------------
 
-def download_to_file(url: str, timeout: int = 30) -> str:
-    """Download url to a temp file and return local path."""
-    r = requests.get(url, stream=True, timeout=timeout)
-    r.raise_for_status()
-    ext = os.path.splitext(url.split("?")[0])[1] or ".bin"
-    fd, path = tempfile.mkstemp(suffix=ext)
-    with os.fdopen(fd, "wb") as f:
-        for chunk in r.iter_content(1024 * 32):
-            if not chunk:
-                continue
-            f.write(chunk)
+def download_to_file(url: str, timeout: int = 30, max_bytes: int = MAX_VIDEO_BYTES) -> str:
+    """Download url to a temp file and return local path; raises ValueError if the body exceeds max_bytes."""
+    with SESSION.get(url, stream=True, timeout=timeout) as r:
+        r.raise_for_status()
+        length = r.headers.get("Content-Length", "")
+        if length.isdigit() and int(length) > max_bytes:
+            raise ValueError(f"response too large: {length} bytes (limit {max_bytes})")
+        # let urllib3 undo any Content-Encoding, as iter_content did
+        r.raw.decode_content = True
+        ext = os.path.splitext(url.split("?")[0])[1] or ".bin"
+        fd, path = tempfile.mkstemp(suffix=ext)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                # 1 MiB reads: far fewer read/write round-trips than 32 KiB iter_content chunks;
+                # counted as they're written since chunked responses carry no Content-Length
+                written = 0
+                while True:
+                    chunk = r.raw.read(1 << 20)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if written > max_bytes:
+                        raise ValueError(f"response too large: over {max_bytes} bytes")
+                    f.write(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
     return path
 
 
-def image_bytes_to_pil(b: bytes) -> Image.Image:
+def download_to_bytes(url: str, timeout: int = 30, max_bytes: int = MAX_IMAGE_BYTES) -> bytearray:
+    """
+    Download url into memory (no temp file); raises ValueError if the body exceeds max_bytes.
+    The buffer is returned as-is: hashing and decoding only need a bytes-like object.
+    """
+    with SESSION.get(url, stream=True, timeout=timeout) as r:
+        r.raise_for_status()
+        length = r.headers.get("Content-Length", "")
+        if length.isdigit() and int(length) > max_bytes:
+            raise ValueError(f"response too large: {length} bytes (limit {max_bytes})")
+        buf = bytearray()
+        for chunk in r.iter_content(1024 * 64):
+            buf += chunk
+            if len(buf) > max_bytes:
+                raise ValueError(f"response too large: over {max_bytes} bytes")
+    return buf
+
+
+@functools.lru_cache(maxsize=1)
+def _get_turbo():
+    """
+    PyTurboJPEG (libjpeg-turbo) decoder built on first JPEG, or None when unavailable;
+    optional, and faster than many Pillow builds.
+    """
+    try:
+        from turbojpeg import TurboJPEG
+        return TurboJPEG()
+    except Exception:
+        return None
+
+
+def image_bytes_to_pil(b: bytes | bytearray) -> Image.Image:
+    turbo = _get_turbo() if b[:3] == b"\xff\xd8\xff" else None
+    if turbo is not None:
+        try:
+            from turbojpeg import TJPF_RGB
+            return Image.fromarray(turbo.decode(b, pixel_format=TJPF_RGB))
+        except Exception:
+            log.debug("turbojpeg decode failed, falling back to Pillow", exc_info=True)
     return Image.open(io.BytesIO(b)).convert("RGB")
 
 
-def frame_to_jpeg_bytes(frame: np.ndarray) -> bytes:
-    _, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
-    return buf.tobytes()
+# ---------------- Result cache ----------------
+# Identical image bytes always yield the same analysis, so results are kept in a
+# bounded LRU keyed by the SHA-1 of the downloaded content.
+
+_result_cache: "OrderedDict[bytes, Dict]" = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+
+def _cache_get(key: bytes) -> Optional[Dict]:
+    with _result_cache_lock:
+        hit = _result_cache.get(key)
+        if hit is not None:
+            _result_cache.move_to_end(key)
+        return hit
+
+
+def _is_failed(result: Any) -> bool:
+    return not isinstance(result, dict) or "__error" in result or "__parse_error" in result
+
+
+def _is_cacheable(result: Any) -> bool:
+    """
+    Only fully successful analyses are cached; error/unparsed results, and videos
+    where any frame failed (e.g. a transient Gemini outage), are retried next time.
+    """
+    if _is_failed(result):
+        return False
+    if result.get("failed_frames"):
+        return False
+    return not any(_is_failed(r) for r in result.get("frame_level_raw_sample", ()))
+
+
+def _cache_put(key: bytes, result: Dict) -> None:
+    if RESULT_CACHE_SIZE <= 0 or not _is_cacheable(result):
+        return
+    with _result_cache_lock:
+        _result_cache[key] = result
+        _result_cache.move_to_end(key)
+        while len(_result_cache) > RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+
+
+# ---------------- Response cache (on disk) ----------------
+# Per-URL analyses persisted across requests/workers, so re-submitted media costs
+# no download and no Gemini tokens. The key folds in ETag/Last-Modified from a
+# HEAD request, so a CDN object that changes under the same URL is re-analyzed.
+# Without a validator (HEAD failed, or no ETag/Last-Modified) a change can't be
+# detected, so those URLs are not cached on disk at all.
+
+@functools.lru_cache(maxsize=1)
+def _get_disk_cache():
+    """Open the cache lazily (after gunicorn forks) or return None when disabled/unavailable."""
+    if not RESPONSE_CACHE_DIR:
+        return None
+    if diskcache is None:
+        log.warning("RESPONSE_CACHE_DIR is set but diskcache is not installed; response cache disabled")
+        return None
+    try:
+        return diskcache.Cache(RESPONSE_CACHE_DIR, size_limit=RESPONSE_CACHE_BYTES)
+    except Exception:
+        log.exception("Failed to open response cache at %s", RESPONSE_CACHE_DIR)
+        return None
+
+
+def _response_cache_key(url: str, validator: str = "") -> str:
+    return hashlib.sha256(f"{url}\0{validator}".encode("utf-8")).hexdigest()
+
+
+def _with_response_cache(url: str, analyze_fn, validator: str = "") -> Dict:
+    cache = _get_disk_cache() if validator else None
+    if cache is None:
+        return analyze_fn(url)
+    key = _response_cache_key(url, validator)
+    try:
+        hit = cache.get(key)
+    except Exception:
+        log.debug("response cache read failed", exc_info=True)
+        hit = None
+    if hit is not None:
+        return hit
+    result = analyze_fn(url)
+    if _is_cacheable(result):
+        try:
+            cache.set(key, result, expire=RESPONSE_CACHE_TTL)
+        except Exception:
+            log.debug("response cache write failed", exc_info=True)
+    return result
 
 
 # ---------------- GenAI helpers ----------------
 
+# URL and frame fan-out can nest; this bounds in-flight Gemini calls per process
+_gemini_slots = threading.BoundedSemaphore(max(1, GEMINI_MAX_CONCURRENCY))
+
+
+# (callable, "contents" | "inputs") that last succeeded; the SDK shape is fixed
+# for the life of the process, so later calls skip the probing walk entirely
+_resolved_call: Optional[Tuple[Any, str]] = None
+
+
 def _call_model_with_fallback(contents: List[Any], model: str):
     """
     Attempt to call the GenAI model using a few method names / shapes depending on SDK version.
     Returns the raw response object.
     """
+    client = _get_client()
     if client is None:
         raise RuntimeError("GenAI client not initialized")
 
+    with _gemini_slots:
+        resolved = _resolved_call
+        if resolved is not None:
+            fn, arg_name = resolved
+            # errors here come from the request itself; re-probing would repeat a billable call
+            return fn(model=model, **{arg_name: contents})
+        return _call_model_candidates(client, contents, model)
+
+
+def _contents_arg_name(fn: Any) -> Optional[str]:
+    """Keyword the callable takes the prompt parts under ("contents" or "inputs"), from its signature."""
+    try:
+        sig = inspect.signature(fn)
+    except (TypeError, ValueError):
+        return "contents"  # not introspectable: assume the documented form
+    for name in ("contents", "inputs"):
+        try:
+            sig.bind(model=None, **{name: None})
+            return name
+        except TypeError:
+            continue
+    return None
+
+
+def _call_model_candidates(client: Any, contents: List[Any], model: str):
+    global _resolved_call
     # Try ordered list of candidate callables
     # Many recent examples use: client.models.generate_content(model=..., contents=[...])
     # Older or alternate SDKs might have client.models.generate(...) or client.generate(...)
@@ -125,17 +351,19 @@ def _call_model_with_fallback(contents: List[Any], model: str):
         fn = getattr(obj, name, None)
         if not callable(fn):
             continue
+        # Most documented form: fn(model=MODEL, contents=[prompt, image_or_file_ref]);
+        # some SDKs expect inputs= instead. The signature decides, so a TypeError
+        # raised inside a real request is never mistaken for a mismatch and retried
+        arg_name = _contents_arg_name(fn)
+        if arg_name is None:
+            continue
         try:
-            # Most documented form: fn(model=MODEL, contents=[prompt, image_or_file_ref])
-            return fn(model=model, contents=contents)
-        except TypeError:
-            # Some SDKs expect inputs= or different arg names, try permissive forms
-            try:
-                return fn(model=model, inputs=contents)
-            except Exception as e:
-                last_exc = e
+            resp = fn(model=model, **{arg_name: contents})
         except Exception as e:
             last_exc = e
+            continue
+        _resolved_call = (fn, arg_name)
+        return resp
     # nothing worked
     raise RuntimeError("No compatible model-call method found on genai client", last_exc)
 
@@ -217,26 +445,65 @@ You are a concise image analyzer. Given the provided image, return ONLY valid JS
 If unsure, give your best estimate. Output must be pure JSON.
 """
 
+BATCH_PROMPT_TEMPLATE = """
+You are a concise image analyzer. You are given {n} frames from the same video, in order.
+For EACH frame produce an object with:
+- caption: one short sentence describing the main scene.
+- tags: array of up to {max_tags} short keywords (no duplicates).
+- num_people: estimated number of people (integer).
+- ambience: up to 2 labels from ['casual','aesthetic','luxurious','energetic','calm','outdoor','indoor','night','daytime','crowded','empty'].
+- quality: object with numeric fields: width, height (px), brightness (0-255 mean), blur_score (higher = sharper).
+
+Return ONLY valid JSON of the form {{"frames": [ ... ]}} containing exactly {n} objects,
+one per frame, in the same order as the frames. If unsure, give your best estimate.
+"""
+
+# Rendered once at import; nearly every call uses the default tag limit.
+IMAGE_PROMPT_DEFAULT = IMAGE_PROMPT_TEMPLATE.format(max_tags=MAX_TAGS)
+
+
+def _image_prompt(max_tags: int) -> str:
+    return IMAGE_PROMPT_DEFAULT if max_tags == MAX_TAGS else IMAGE_PROMPT_TEMPLATE.format(max_tags=max_tags)
+
+
+@functools.lru_cache(maxsize=64)
+def _batch_prompt(n: int, max_tags: int) -> str:
+    # only a handful of (batch size, tag limit) pairs ever occur
+    return BATCH_PROMPT_TEMPLATE.format(n=n, max_tags=max_tags)
+
+
+_CODE_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.MULTILINE)
+_OBJECT_START_RE = re.compile(r"\{")
+_JSON_DECODER = json.JSONDecoder()
+
 
 def _parse_json_from_text(text: str) -> Any:
-    """Strictly parse JSON or attempt to extract the first {...} block."""
+    """
+    Strictly parse JSON; else retry with markdown code fences stripped; else decode the first
+    complete {...} object found scanning left to right (prose around it is ignored).
+    """
     if not text:
         return {"__error": "no_text_to_parse"}
     try:
-        return json.loads(text)
-    except Exception:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        pass
+    try:
+        return orjson.loads(_CODE_FENCE_RE.sub("", text.strip()))
+    except orjson.JSONDecodeError as e:
+        last_exc: Exception = e
+    for m in _OBJECT_START_RE.finditer(text):
         try:
-            start = text.index("{")
-            end = text.rindex("}") + 1
-            sub = text[start:end]
-            return json.loads(sub)
-        except Exception as e:
-            return {"__raw": text, "__parse_error": str(e)}
+            obj, _ = _JSON_DECODER.raw_decode(text, m.start())
+            return obj
+        except ValueError as e:
+            last_exc = e
+    return {"__raw": text, "__parse_error": str(last_exc)}
 
 
 def ask_gemini_with_image(pil_image: Image.Image, max_tags: int = MAX_TAGS) -> Dict:
     """Send a single PIL image to Gemini and request strict JSON output."""
-    prompt = IMAGE_PROMPT_TEMPLATE.format(max_tags=max_tags)
+    prompt = _image_prompt(max_tags)
     # Build contents in the form [prompt, image] which the SDK commonly accepts
     contents = [prompt, pil_image]
     try:
@@ -252,8 +519,37 @@ def ask_gemini_with_image(pil_image: Image.Image, max_tags: int = MAX_TAGS) -> D
     return _parse_json_from_text(text)
 
 
+def ask_gemini_with_images_batch(pil_images: List[Image.Image], max_tags: int = MAX_TAGS) -> List[Dict]:
+    """
+    Send several frames with one prompt in a single Gemini call and return one dict per frame, in order.
+    Falls back to per-frame calls only when the batch returns the wrong number/shape of results;
+    if the call itself fails (quota, 429, outage) every frame gets the error instead, so a
+    throttled batch never fans out into N more requests.
+    """
+    if len(pil_images) == 1:
+        return [ask_gemini_with_image(pil_images[0], max_tags=max_tags)]
+
+    prompt = _batch_prompt(len(pil_images), max_tags)
+    try:
+        resp = _call_model_with_fallback(contents=[prompt, *pil_images], model=MODEL)
+    except Exception as e:
+        log.exception("gemini batch call failed")
+        return [{"__error": "gemini_call_failed", "message": str(e)} for _ in pil_images]
+
+    text = _extract_text_from_response(resp)
+    parsed = _parse_json_from_text(text) if text else None
+    frames = parsed.get("frames") if isinstance(parsed, dict) else parsed
+
+    if isinstance(frames, list) and len(frames) == len(pil_images):
+        return [f if isinstance(f, dict) else {"__error": "bad_frame_result", "raw": str(f)} for f in frames]
+
+    log.warning("gemini batch of %d frames returned an unusable result; retrying per frame", len(pil_images))
+    return [ask_gemini_with_image(img, max_tags=max_tags) for img in pil_images]
+
+
 def analyze_image_url_via_gemini(image_url: str) -> Dict:
     """Try to send URL directly using client.files.upload when available, else download and send image bytes."""
+    client = _get_client()
     if client is None:
         return {"__error": "no_genai_client"}
 
@@ -264,7 +560,7 @@ def analyze_image_url_via_gemini(image_url: str) -> Dict:
                 # Some SDKs let you pass a remote URL to files.upload; if not, this will raise
                 file_ref = client.files.upload(file=image_url)
                 # pass the returned file object into contents
-                prompt = IMAGE_PROMPT_TEMPLATE.format(max_tags=MAX_TAGS)
+                prompt = IMAGE_PROMPT_DEFAULT
                 resp = _call_model_with_fallback(contents=[prompt, file_ref], model=MODEL)
                 text = _extract_text_from_response(resp)
                 if text:
@@ -277,15 +573,15 @@ def analyze_image_url_via_gemini(image_url: str) -> Dict:
 
     # fallback: download the image and send as PIL
     try:
-        path = download_to_file(image_url)
-        with open(path, "rb") as f:
-            b = f.read()
-        try:
-            os.remove(path)
-        except Exception:
-            pass
+        b = download_to_bytes(image_url)
+        key = hashlib.sha1(b).digest()
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
         img = image_bytes_to_pil(b)
-        return ask_gemini_with_image(img)
+        result = ask_gemini_with_image(img)
+        _cache_put(key, result)
+        return result
     except Exception as e:
         log.exception("failed to download or analyze image")
         return {"__error": "download_failed", "message": str(e), "trace": traceback.format_exc()}
@@ -293,24 +589,27 @@ def analyze_image_url_via_gemini(image_url: str) -> Dict:
 
 # ---------------- Video handling ----------------
 
-def analyze_video_url(video_url: str, sampling_seconds: int = FRAME_SAMPLING_SECONDS) -> Dict:
-    """
-    Download video, sample frames every sampling_seconds, call Gemini per sampled frame (PIL),
-    then aggregate results: union of tags, max num_people, most common ambience, averaged quality.
-    """
+def _frame_size(w: int, h: int, max_dim: int = FRAME_MAX_DIM) -> Tuple[int, int]:
+    """Size that fits (w, h) within max_dim on the longest edge; unchanged if already small."""
+    if max(w, h) <= max_dim:
+        return w, h
+    scale = max_dim / float(max(w, h))
+    return int(w * scale), int(h * scale)
+
+
+def _analyze_frame_batch(pil_images: List[Image.Image]) -> List[Dict]:
     try:
-        vpath = download_to_file(video_url)
+        return ask_gemini_with_images_batch(pil_images)
     except Exception as e:
-        log.exception("video download failed")
-        return {"__error": "video_download_failed", "message": str(e)}
+        return [{"__error": "frame_analysis_failed", "message": str(e)} for _ in pil_images]
+
 
+def _sample_frames_cv2(vpath: str, sampling_seconds: int) -> Optional[Tuple[List[Image.Image], float]]:
+    """Decode with OpenCV, keeping one frame every sampling_seconds. None if the file can't be opened."""
+    import cv2
     cap = cv2.VideoCapture(vpath)
     if not cap.isOpened():
-        try:
-            os.remove(vpath)
-        except Exception:
-            pass
-        return {"__error": "video_open_failed"}
+        return None
 
     fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
@@ -318,53 +617,135 @@ def analyze_video_url(video_url: str, sampling_seconds: int = FRAME_SAMPLING_SEC
     interval = max(1, int(round(fps * sampling_seconds)))
 
     frame_idx = 0
-    sampled = 0
-    frame_results = []
+    pil_frames: List[Image.Image] = []
 
     try:
         while True:
-            ret, frame = cap.read()
-            if not ret:
+            # grab() advances without converting; only sampled frames pay for retrieve()
+            if not cap.grab():
                 break
             if frame_idx % interval == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
                 h, w = frame.shape[:2]
-                max_dim = 1024
-                if max(h, w) > max_dim:
-                    scale = max_dim / float(max(h, w))
-                    frame = cv2.resize(frame, (int(w * scale), int(h * scale)))
-                jpeg_bytes = frame_to_jpeg_bytes(frame)
-                try:
-                    pil = image_bytes_to_pil(jpeg_bytes)
-                    out = ask_gemini_with_image(pil)
-                except Exception as e:
-                    out = {"__error": "frame_analysis_failed", "message": str(e)}
-                frame_results.append(out)
-                sampled += 1
+                size = _frame_size(w, h)
+                if size != (w, h):
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                # PIL's BGR raw decoder swaps channels while copying the contiguous frame in
+                fh, fw = frame.shape[:2]
+                pil_frames.append(Image.frombuffer("RGB", (fw, fh), frame, "raw", "BGR", 0, 1))
             frame_idx += 1
     finally:
         cap.release()
+
+    return pil_frames, duration
+
+
+def _sample_frames_av(vpath: str, sampling_seconds: int) -> Optional[Tuple[List[Image.Image], float]]:
+    """
+    Decode with PyAV (FFmpeg) using its multi-threaded decoder, keeping the first frame at or after
+    each sampling_seconds boundary. For sparse sampling only keyframes are decoded at all.
+    """
+    import av
+    try:
+        container = av.open(vpath)
+    except Exception:
+        log.debug("PyAV could not open %s", vpath, exc_info=True)
+        return None
+
+    pil_frames: List[Image.Image] = []
+    try:
+        if not container.streams.video:
+            return None
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        if sampling_seconds >= PYAV_KEYFRAME_ONLY_SECONDS:
+            stream.codec_context.skip_frame = "NONKEY"
+
+        if stream.duration and stream.time_base:
+            duration = float(stream.duration * stream.time_base)
+        else:
+            duration = container.duration / av.time_base if container.duration else 0
+
+        next_t = 0.0
+        for frame in container.decode(stream):
+            if frame.pts is None or frame.time_base is None:
+                continue
+            t = float(frame.pts * frame.time_base)
+            if t < next_t:
+                continue
+            while next_t <= t:
+                next_t += sampling_seconds
+            size = _frame_size(frame.width, frame.height)
+            pil_frames.append(frame.to_image(width=size[0], height=size[1], interpolation="AREA"))
+    finally:
+        container.close()
+
+    return pil_frames, duration
+
+
+def _pick_sampler():
+    """PyAV when USE_PYAV is set and `av` is installed, else OpenCV."""
+    return _sample_frames_av if _PYAV_AVAILABLE else _sample_frames_cv2
+
+
+def analyze_video_url(video_url: str, sampling_seconds: int = FRAME_SAMPLING_SECONDS) -> Dict:
+    """
+    Download video, sample frames every sampling_seconds, call Gemini per sampled frame (PIL),
+    then aggregate results: union of tags, max num_people, most common ambience, averaged quality.
+    """
+    try:
+        vpath = download_to_file(video_url)
+    except Exception as e:
+        log.exception("video download failed")
+        return {"__error": "video_download_failed", "message": str(e)}
+
+    sampler = _pick_sampler()
+    try:
+        sampled_out = sampler(vpath, sampling_seconds)
+    finally:
         try:
             os.remove(vpath)
         except Exception:
             pass
 
+    if sampled_out is None:
+        return {"__error": "video_open_failed"}
+    pil_frames, duration = sampled_out
+
+    # Pack frames into multi-image requests (one prompt per batch), and run the
+    # independent batches concurrently
+    sampled = len(pil_frames)
+    batch_size = max(1, GEMINI_BATCH_SIZE)
+    batches = [pil_frames[i:i + batch_size] for i in range(0, sampled, batch_size)]
+    frame_results: List[Dict] = []
+    if batches:
+        with ThreadPoolExecutor(max_workers=max(1, min(GEMINI_WORKERS, len(batches)))) as ex:
+            for batch_results in ex.map(_analyze_frame_batch, batches):
+                frame_results.extend(batch_results)
+
     # Aggregate
     tags: List[str] = []
-    ambience_counts: Dict[str, int] = {}
+    tags_seen = set()
+    ambience_counts: Counter = Counter()
     captions: List[str] = []
     num_people_max = 0
-    numeric_qualities: List[Dict[str, float]] = []
+    failed_frames = 0
+    # key -> [sum, count], accumulated in the same pass as everything else
+    quality_sums: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0])
 
     for r in frame_results:
-        if not isinstance(r, dict):
+        if _is_failed(r):
+            failed_frames += 1
             continue
         if "tags" in r and isinstance(r["tags"], list):
             for t in r["tags"]:
-                if t not in tags:
+                if isinstance(t, str) and t not in tags_seen:
+                    tags_seen.add(t)
                     tags.append(t)
         if "ambience" in r and isinstance(r["ambience"], list):
-            for a in r["ambience"]:
-                ambience_counts[a] = ambience_counts.get(a, 0) + 1
+            ambience_counts.update(r["ambience"])
         if "caption" in r and isinstance(r["caption"], str):
             captions.append(r["caption"])
         if "num_people" in r:
@@ -375,21 +756,19 @@ def analyze_video_url(video_url: str, sampling_seconds: int = FRAME_SAMPLING_SEC
             except Exception:
                 pass
         if "quality" in r and isinstance(r["quality"], dict):
-            numeric_qualities.append(r["quality"])
+            for k, v in r["quality"].items():
+                if isinstance(v, (int, float)):
+                    acc = quality_sums[k]
+                    acc[0] += float(v)
+                    acc[1] += 1
 
-    top_ambience = sorted(ambience_counts.items(), key=lambda x: x[1], reverse=True)
-    ambience_top2 = [a for a, _ in top_ambience[:2]]
+    ambience_top2 = [a for a, _ in ambience_counts.most_common(2)]
 
-    agg_quality: Dict[str, float] = {}
-    if numeric_qualities:
-        keys = set().union(*[set(q.keys()) for q in numeric_qualities])
-        for k in keys:
-            vals = [float(q[k]) for q in numeric_qualities if k in q and isinstance(q[k], (int, float))]
-            if vals:
-                agg_quality[k] = sum(vals) / len(vals)
+    agg_quality: Dict[str, float] = {k: total / n for k, (total, n) in quality_sums.items()}
 
-    return {
+    result = {
         "sampled_frames": sampled,
+        "failed_frames": failed_frames,
         "duration_seconds": duration,
         "caption_examples": captions[:3],
         "tags": tags[:MAX_TAGS],
@@ -398,11 +777,98 @@ def analyze_video_url(video_url: str, sampling_seconds: int = FRAME_SAMPLING_SEC
         "quality": agg_quality,
         "frame_level_raw_sample": frame_results[:3],
     }
+    if failed_frames == sampled:
+        # nothing usable (no frames, or every Gemini call failed): surface it as an error
+        result["__error"] = "no_frames_analyzed" if sampled == 0 else "all_frames_failed"
+    return result
+
+
+def preflight(url: str) -> Tuple[str, int, str]:
+    """
+    HEAD the URL and return (mime type, Content-Length, cache validator).
+    Unknown fields come back as "" / 0, e.g. when the server rejects HEAD.
+    The request also warms the pooled connection for the GET that follows.
+    """
+    try:
+        h = SESSION.head(url, allow_redirects=True, timeout=5)
+    except Exception:
+        log.debug("HEAD failed for %s", url, exc_info=True)
+        return "", 0, ""
+    if not h.ok:
+        return "", 0, ""
+    mime = h.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    length = h.headers.get("Content-Length", "")
+    validator = h.headers.get("ETag") or h.headers.get("Last-Modified") or ""
+    return mime, int(length) if length.isdigit() else 0, validator
+
+
+def _media_kind(url: str, mime: str) -> Optional[str]:
+    """'video' / 'image' from the server's MIME type, else from the extension; None if unsupported."""
+    if mime.startswith("video/"):
+        return "video"
+    if mime.startswith("image/"):
+        return "image"
+    if mime and mime not in ("application/octet-stream", "binary/octet-stream"):
+        return None
+    # no usable type from the server: fall back to the extension
+    return "video" if url.lower().split("?")[0].endswith(VIDEO_EXTS) else "image"
+
+
+def process_url(url: str) -> Dict:
+    """Dispatch a single URL to the image or video analyzer, never raising."""
+    try:
+        mime, length, validator = preflight(url)
+        kind = _media_kind(url, mime)
+        if kind is None:
+            return {"__error": "unsupported_media_type", "content_type": mime}
+        limit = MAX_VIDEO_BYTES if kind == "video" else MAX_IMAGE_BYTES
+        if length > limit:
+            return {"__error": "too_large", "content_length": length, "limit": limit}
+        if kind == "video":
+            return _with_response_cache(url, analyze_video_url, validator)
+        return _with_response_cache(url, analyze_image_url_via_gemini, validator)
+    except Exception as e:
+        log.exception("processing failed for %s", url)
+        return {"__error": "processing_failed", "message": str(e), "trace": traceback.format_exc()}
 
 
 # ---------------- Flask app ----------------
 app = Flask(__name__)
 
+_ORJSON_OPTS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _json_response(obj: Any, status: int = 200):
+    """Serialize `obj` with orjson (Rust encoder, handles numpy scalars natively)."""
+    return app.response_class(orjson.dumps(obj, option=_ORJSON_OPTS), status=status, mimetype="application/json")
+
+
+# module -> distributions that may provide it (first installed one reports the version)
+_HEALTH_DEPENDENCIES = {
+    "flask": ("flask",),
+    "requests": ("requests",),
+    "PIL": ("pillow",),
+    "cv2": ("opencv-python", "opencv-python-headless", "opencv-contrib-python", "opencv-contrib-python-headless"),
+    "numpy": ("numpy",),
+    "google.genai": ("google-genai",),
+}
+
+
+def _module_available(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _dist_version(dists: Tuple[str, ...]) -> str:
+    for dist in dists:
+        try:
+            return importlib.metadata.version(dist)
+        except importlib.metadata.PackageNotFoundError:
+            continue
+    return "unknown"
+
 
 @app.route("/", methods=["GET"])
 def health():
@@ -417,10 +883,17 @@ def health():
         "services": {}
     }
     
-    # Check GenAI client
+    # Check GenAI client without building it: the client (and google-genai) load on first analyze
+    if _get_client.cache_info().currsize:
+        client_ok = _get_client() is not None
+        client_msg = "GenAI client initialized" if client_ok else "GenAI client not available"
+    else:
+        client_ok = _module_available("google.genai") or _module_available("google_genai")
+        client_msg = ("GenAI client created on first request" if client_ok
+                      else "google-genai SDK not installed")
     health_status["services"]["genai_client"] = {
-        "status": "ok" if client is not None else "error",
-        "message": "GenAI client initialized" if client is not None else "GenAI client not available"
+        "status": "ok" if client_ok else "error",
+        "message": client_msg
     }
     
     # Check API key
@@ -450,29 +923,13 @@ def health():
             "error": f"System info unavailable: {str(e)}"
         }
     
-    # Dependencies check
+    # Dependencies check: locate modules and read versions from package metadata, without importing
     dependencies_status = {}
-    required_modules = ["flask", "requests", "PIL", "cv2", "numpy", "google.genai"]
-    
-    for module in required_modules:
-        try:
-            if module == "PIL":
-                import PIL
-                dependencies_status[module] = {"status": "ok", "version": PIL.__version__}
-            elif module == "cv2":
-                import cv2
-                dependencies_status[module] = {"status": "ok", "version": cv2.__version__}
-            elif module == "numpy":
-                import numpy
-                dependencies_status[module] = {"status": "ok", "version": numpy.__version__}
-            elif module == "google.genai":
-                import google.genai
-                dependencies_status[module] = {"status": "ok", "version": getattr(google.genai, '__version__', 'unknown')}
-            else:
-                __import__(module)
-                dependencies_status[module] = {"status": "ok"}
-        except ImportError as e:
-            dependencies_status[module] = {"status": "error", "message": str(e)}
+    for module, dists in _HEALTH_DEPENDENCIES.items():
+        if _module_available(module):
+            dependencies_status[module] = {"status": "ok", "version": _dist_version(dists)}
+        else:
+            dependencies_status[module] = {"status": "error", "message": f"No module named '{module}'"}
     
     health_status["dependencies"] = dependencies_status
     
@@ -488,33 +945,29 @@ def health():
     health_status["status"] = "healthy" if not has_errors else "degraded"
     health_status["overall_ok"] = not has_errors
     
-    return jsonify(health_status), 200 if not has_errors else 503
+    return _json_response(health_status, 200 if not has_errors else 503)
 
 
 @app.route("/analyze", methods=["POST"])
 def analyze():
     payload = request.get_json(force=True, silent=True)
     if not payload or "urls" not in payload:
-        return jsonify({"error": "please POST JSON with 'urls' array"}), 400
+        return _json_response({"error": "please POST JSON with 'urls' array"}, 400)
 
     urls: List[str] = payload["urls"]
     out: Dict[str, Any] = {}
 
-    for url in urls:
-        try:
-            lower = url.lower().split("?")[0]
-            if lower.endswith(VIDEO_EXTS):
-                out[url] = analyze_video_url(url)
-            else:
-                out[url] = analyze_image_url_via_gemini(url)
-        except Exception as e:
-            log.exception("processing failed for %s", url)
-            out[url] = {"__error": "processing_failed", "message": str(e), "trace": traceback.format_exc()}
+    # URLs are independent and I/O-bound (download + Gemini), so fan them out
+    if urls:
+        with ThreadPoolExecutor(max_workers=max(1, min(URL_WORKERS, len(urls)))) as ex:
+            for url, result in zip(urls, ex.map(process_url, urls)):
+                out[url] = result
 
-    return jsonify(out)
+    return _json_response(out)
 
 
 if __name__ == "__main__":
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py).
     # When running locally keep debug off unless explicitly enabled
     debug_flag = os.environ.get("FLASK_DEBUG", "0") in ("1", "true", "True")
     app.run(host="0.0.0.0", port=PORT, debug=debug_flag)
@@ -0,0 +1,31 @@
+"""
+gunicorn.conf.py
+Production server settings for the analyzer API.
+
+Run from this directory:
+    gunicorn -c gunicorn.conf.py app:app
+
+Every value can be overridden through the environment so the same file works
+for local runs, containers and a unix socket behind nginx.
+"""
+
+import multiprocessing
+import os
+
+# TCP by default; set GUNICORN_BIND=unix:/run/analyzer.sock behind nginx
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+
+# Preforked processes scale past the GIL; --preload forks after import so the
+# already-imported modules are shared copy-on-write. The GenAI client, cv2 and
+# the response cache are created lazily, once per worker, after the fork
+workers = int(os.getenv("GUNICORN_WORKERS", str(multiprocessing.cpu_count())))
+preload_app = True
+
+# Requests spend nearly all their time waiting on downloads and Gemini, so each
+# worker serves several at once on threads instead of one per process
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# Video requests sample many frames through Gemini, so allow well over 30s
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
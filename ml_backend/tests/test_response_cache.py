@@ -0,0 +1,57 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+class FakeCache:
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, expire=None):
+        self.store[key] = value
+
+
+def _install(monkeypatch):
+    cache = FakeCache()
+    monkeypatch.setattr(app, "_get_disk_cache", lambda: cache)
+    calls = []
+
+    def analyze(url):
+        calls.append(url)
+        return {"tags": ["a"], "n": len(calls)}
+
+    return cache, calls, analyze
+
+
+def test_result_with_validator_is_cached(monkeypatch):
+    cache, calls, analyze = _install(monkeypatch)
+    first = app._with_response_cache("https://cdn/x.jpg", analyze, validator='"etag-1"')
+    second = app._with_response_cache("https://cdn/x.jpg", analyze, validator='"etag-1"')
+    assert first == second
+    assert len(calls) == 1
+    assert len(cache.store) == 1
+
+
+def test_result_without_validator_is_not_cached(monkeypatch):
+    cache, calls, analyze = _install(monkeypatch)
+    first = app._with_response_cache("https://cdn/x.jpg", analyze, validator="")
+    second = app._with_response_cache("https://cdn/x.jpg", analyze, validator="")
+    assert first["n"] == 1 and second["n"] == 2
+    assert cache.store == {}
+
+
+def test_process_url_without_validator_skips_disk_cache(monkeypatch):
+    cache, calls, analyze = _install(monkeypatch)
+    # HEAD succeeded but the server sent neither ETag nor Last-Modified
+    monkeypatch.setattr(app, "preflight", lambda url: ("image/jpeg", 1000, ""))
+    monkeypatch.setattr(app, "analyze_image_url_via_gemini", analyze)
+    app.process_url("https://cdn/x.jpg")
+    app.process_url("https://cdn/x.jpg")
+    assert len(calls) == 2
+    assert cache.store == {}
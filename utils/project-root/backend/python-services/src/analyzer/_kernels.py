@@ -0,0 +1,56 @@
+# src/analyzer/_kernels.py
+"""
+Optional Numba kernels for image_analysis.
+
+Provides:
+- gray_mean_and_laplacian_var(gray) -> (mean, var) in a single pass over a 2-D uint8 image
+
+`gray_mean_and_laplacian_var` is None when numba is not installed; callers fall back to OpenCV.
+"""
+
+try:
+    import numba
+except Exception:
+    numba = None
+
+
+def _gray_mean_and_laplacian_var(gray):
+    """
+    Mean intensity and variance of the 4-neighbour Laplacian, matching
+    cv2.mean and cv2.Laplacian(gray, ddepth) (ksize=1, BORDER_REFLECT_101).
+    """
+    h, w = gray.shape
+    total = 0.0
+    lap_total = 0.0
+    lap_sq_total = 0.0
+    for i in range(h):
+        # reflect-101 border: row -1 mirrors row 1, row h mirrors row h-2
+        up = i - 1 if i > 0 else min(1, h - 1)
+        down = i + 1 if i < h - 1 else max(h - 2, 0)
+        row = 0.0
+        row_lap = 0.0
+        row_lap_sq = 0.0
+        for j in range(w):
+            left = j - 1 if j > 0 else min(1, w - 1)
+            right = j + 1 if j < w - 1 else max(w - 2, 0)
+            c = float(gray[i, j])
+            lap = (float(gray[up, j]) + float(gray[down, j])
+                   + float(gray[i, left]) + float(gray[i, right]) - 4.0 * c)
+            row += c
+            row_lap += lap
+            row_lap_sq += lap * lap
+        total += row
+        lap_total += row_lap
+        lap_sq_total += row_lap_sq
+    n = float(h * w)
+    lap_mean = lap_total / n
+    return total / n, lap_sq_total / n - lap_mean * lap_mean
+
+
+# nogil rather than parallel=True: the job worker already runs several posts on a
+# thread pool, and numba's default workqueue threading layer deadlocks when
+# parallel kernels are launched from multiple threads at once
+if numba is not None:
+    gray_mean_and_laplacian_var = numba.njit(nogil=True, fastmath=True, cache=True)(_gray_mean_and_laplacian_var)
+else:
+    gray_mean_and_laplacian_var = None
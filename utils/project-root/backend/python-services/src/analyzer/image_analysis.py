@@ -3,88 +3,285 @@
 Robust image analysis with lazy imports of cv2 and numpy.
 
 Provides:
-- analyze_image(path, caption) -> dict with tags, vibe, lighting_score, quality_score, faces_count
+- analyze_image(image, caption) -> dict with tags, vibe, lighting_score, quality_score, faces_count
 
 If cv2 / numpy is unavailable, returns a caption-only fallback.
 """
 
+from collections import OrderedDict
 from typing import Dict, List
+import io
 import os
+import hashlib
 import logging
+import threading
+
+from src.common import config
 
 logger = logging.getLogger(__name__)
 
+# pyahocorasick is optional; lets tags_from_caption match every keyword in one pass
+try:
+    import ahocorasick
+except Exception:
+    ahocorasick = None
+
+# Pillow is optional; its lazy Image.open reads the dimensions from the header
+# so _read_reduced picks the decode flag without decoding twice
+try:
+    from PIL import Image as _PILImage
+except Exception:
+    _PILImage = None
+
 _cv2 = None
 _np = None
 _HAAR_PATH = None
+_YUNET_PATH = None  # CNN face detector model, preferred over Haar when it loads
+_fused_stats = None  # numba kernel from analyzer._kernels, when available
+_use_opencl = False  # config.USE_OPENCL and an OpenCL device was found
+_setup_lock = threading.Lock()  # serializes _ensure_cv2's one-time setup
+_tls = threading.local()
+
+# Longest edge (px) images are shrunk to before any metric is computed.
+_MAX_EDGE = 512
+
+# blake2b(image bytes) -> (light, quality, faces) | None, most recently used last
+_METRICS_CACHE_SIZE = 256
+_metrics_cache: "OrderedDict[bytes, tuple | None]" = OrderedDict()
+_metrics_lock = threading.Lock()
+
+# Caption keyword -> tag table, built once at import rather than per post.
+_CAPTION_KEYWORDS = (
+    ("food", ("food", "pizza", "sushi", "delicious")),
+    ("travel", ("travel", "beach", "vacation", "trip", "sea")),
+    ("fashion", ("fashion", "style", "ootd")),
+    ("fitness", ("gym", "workout", "fitness", "fit")),
+    ("nature", ("sunset", "sunrise", "mountain", "sky")),
+)
+
+def _build_caption_automaton():
+    """keyword -> tuple of _CAPTION_KEYWORDS indices it implies; None without pyahocorasick."""
+    if ahocorasick is None:
+        return None
+    ranks: Dict[str, list] = {}
+    for rank, (_, kws) in enumerate(_CAPTION_KEYWORDS):
+        for k in kws:
+            ranks.setdefault(k, []).append(rank)
+    automaton = ahocorasick.Automaton()
+    for k, rs in ranks.items():
+        automaton.add_word(k, tuple(rs))
+    automaton.make_automaton()
+    return automaton
+
+_CAPTION_AUTOMATON = _build_caption_automaton()
+
+def _find_haar_path(cv2_mod):
+    """Determine the Haar cascade path in a robust way; None if it can't be found."""
+    # try typical attribute
+    try:
+        return cv2_mod.data.haarcascades + "haarcascade_frontalface_default.xml"
+    except Exception:
+        pass
+    # fallback: try to locate the file relative to cv2.__file__
+    try:
+        cv2_dir = os.path.dirname(cv2_mod.__file__)
+        candidate = os.path.join(cv2_dir, "data", "haarcascade_frontalface_default.xml")
+        if os.path.exists(candidate):
+            return candidate
+        # try package data directories
+        candidate2 = os.path.join(cv2_dir, "..", "share", "opencv4", "haarcascades", "haarcascade_frontalface_default.xml")
+        candidate2 = os.path.normpath(candidate2)
+        if os.path.exists(candidate2):
+            return candidate2
+    except Exception:
+        pass
+    return None
 
 def _ensure_cv2() -> bool:
     """
-    Lazy-import OpenCV and numpy. Determine Haar cascade path in a robust way.
+    Lazy-import OpenCV and numpy and set up the detectors, kernel and thread settings.
     Returns True if cv2 is available and usable, False otherwise.
+    Safe to call from many analysis threads at once: setup runs once under
+    _setup_lock and _cv2/_np are published only after every step has finished.
     """
-    global _cv2, _np, _HAAR_PATH
+    global _cv2, _np, _HAAR_PATH, _YUNET_PATH, _fused_stats
     if _cv2 is not None:
         return True
-    try:
-        import cv2 as cv2_mod
-        import numpy as np_mod
-        _cv2 = cv2_mod
-        _np = np_mod
-        # try typical attribute
+    with _setup_lock:
+        if _cv2 is not None:
+            return True
         try:
-            _HAAR_PATH = _cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-        except Exception:
-            # fallback: try to locate the file relative to cv2.__file__
-            try:
-                cv2_dir = os.path.dirname(_cv2.__file__)
-                candidate = os.path.join(cv2_dir, "data", "haarcascade_frontalface_default.xml")
-                if os.path.exists(candidate):
-                    _HAAR_PATH = candidate
-                else:
-                    # try package data directories
-                    candidate2 = os.path.join(cv2_dir, "..", "share", "opencv4", "haarcascades", "haarcascade_frontalface_default.xml")
-                    candidate2 = os.path.normpath(candidate2)
-                    if os.path.exists(candidate2):
-                        _HAAR_PATH = candidate2
-                    else:
-                        _HAAR_PATH = None
-            except Exception:
-                _HAAR_PATH = None
+            import cv2 as cv2_mod
+            import numpy as np_mod
+            _HAAR_PATH = _find_haar_path(cv2_mod)
+            _validate_cascade(cv2_mod)
+            _validate_yunet(cv2_mod)
+            _fused_stats = _load_fused_stats(np_mod)
+            _configure_cv2(cv2_mod)
+        except Exception as e:
+            logger.debug("cv2/numpy not available: %s", e)
+            _HAAR_PATH = None
+            _YUNET_PATH = None
+            _fused_stats = None
+            return False
+        _np = np_mod
+        _cv2 = cv2_mod
         return True
+
+def _configure_cv2(cv2_mod):
+    """
+    Enable OpenCV's SIMD dispatch and size its internal parallel_for_ pool so that
+    ANALYZE_WORKERS concurrent posts x OpenCV threads doesn't oversubscribe the CPUs.
+    """
+    try:
+        cv2_mod.setUseOptimized(True)
+        threads = max(1, (os.cpu_count() or 1) // max(1, config.ANALYZE_WORKERS))
+        cv2_mod.setNumThreads(threads)
+        parallel = next((line.strip() for line in cv2_mod.getBuildInformation().splitlines()
+                         if "Parallel framework" in line), "unknown")
+        _configure_opencl(cv2_mod)
+        logger.info("OpenCV %s: optimized=%s, threads=%d (%s)",
+                    cv2_mod.__version__, cv2_mod.useOptimized(), cv2_mod.getNumThreads(), parallel)
+    except Exception as e:
+        logger.debug("OpenCV runtime tuning skipped: %s", e)
+
+def _configure_opencl(cv2_mod):
+    """Enable OpenCV's transparent API (UMat -> OpenCL) when USE_OPENCL is set and a device exists."""
+    global _use_opencl
+    if not config.USE_OPENCL:
+        return
+    if not cv2_mod.ocl.haveOpenCL():
+        logger.info("USE_OPENCL is set but no OpenCL device is available; staying on the CPU")
+        return
+    cv2_mod.ocl.setUseOpenCL(True)
+    _use_opencl = cv2_mod.ocl.useOpenCL()
+    if _use_opencl:
+        logger.info("OpenCL enabled on %s", cv2_mod.ocl.Device.getDefault().name())
+
+def _validate_cascade(cv2_mod):
+    """
+    Parse the Haar XML once up front; if it fails to load, clear _HAAR_PATH so
+    detect_faces short-circuits instead of re-parsing a bad file per image.
+    The loaded classifier becomes this thread's instance.
+    """
+    global _HAAR_PATH
+    if not _HAAR_PATH:
+        return
+    try:
+        cascade = cv2_mod.CascadeClassifier(_HAAR_PATH)
+        ok = not cascade.empty()
     except Exception as e:
-        logger.debug("cv2/numpy not available: %s", e)
-        _cv2 = None
-        _np = None
+        logger.debug("Haar cascade unavailable: %s", e)
+        ok = False
+    if not ok:
+        logger.debug("Haar cascade failed to load from %s", _HAAR_PATH)
         _HAAR_PATH = None
-        return False
+        return
+    _tls.cascade = cascade
 
-def brightness_score(img) -> float:
-    if not _ensure_cv2():
-        return 0.5
-    gray = _cv2.cvtColor(img, _cv2.COLOR_BGR2GRAY)
-    mean = float(gray.mean())
+def _validate_yunet(cv2_mod):
+    """
+    Load the YuNet detector from config.YUNET_MODEL_PATH once; on success it becomes
+    this thread's instance and _YUNET_PATH is set, otherwise Haar stays in use.
+    """
+    global _YUNET_PATH
+    path = config.YUNET_MODEL_PATH
+    if not path or not os.path.exists(path):
+        return
+    try:
+        _tls.yunet = cv2_mod.FaceDetectorYN_create(path, "", (320, 320), score_threshold=0.6)
+        _YUNET_PATH = path
+    except Exception as e:
+        logger.debug("YuNet face detector unavailable, using Haar: %s", e)
+
+def _load_fused_stats(np_mod):
+    """
+    Return the numba brightness/sharpness kernel, compiled via a tiny warmup call,
+    or None if numba is missing or compilation fails.
+    """
+    try:
+        from src.analyzer._kernels import gray_mean_and_laplacian_var
+        if gray_mean_and_laplacian_var is None:
+            return None
+        gray_mean_and_laplacian_var(np_mod.zeros((2, 2), dtype=np_mod.uint8))
+        return gray_mean_and_laplacian_var
+    except Exception as e:
+        logger.debug("numba kernel unavailable, using OpenCV metrics: %s", e)
+        return None
+
+def _cascade():
+    """
+    Return this thread's CascadeClassifier, loading the XML on first use.
+    A classifier keeps internal scan state, so it is not shared across threads;
+    each thread parses the XML exactly once (validated in _ensure_cv2).
+    """
+    cascade = getattr(_tls, "cascade", None)
+    if cascade is None:
+        cascade = _cv2.CascadeClassifier(_HAAR_PATH)
+        _tls.cascade = cascade
+    return cascade
+
+def _yunet():
+    """This thread's FaceDetectorYN (input size is per-call state, so never shared)."""
+    detector = getattr(_tls, "yunet", None)
+    if detector is None:
+        detector = _cv2.FaceDetectorYN_create(_YUNET_PATH, "", (320, 320), score_threshold=0.6)
+        _tls.yunet = detector
+    return detector
+
+# The metric helpers below take the shared gray image and assume _ensure_cv2()
+# already succeeded; analyze_image checks it once per image at entry.
+
+def brightness_score(gray) -> float:
+    mean = _cv2.mean(gray)[0]
     return mean / 255.0
 
-def sharpness_score(img) -> float:
-    if not _ensure_cv2():
-        return 0.5
-    gray = _cv2.cvtColor(img, _cv2.COLOR_BGR2GRAY)
-    lap = _cv2.Laplacian(gray, _cv2.CV_64F)
-    var = lap.var()
+def sharpness_score(gray, scale: float = 1.0) -> float:
+    """
+    `scale` is the factor `gray` was resized by (<1 when downscaled); the
+    Laplacian variance is converted back to full-resolution units with it.
+    """
+    # int16 holds the 3x3 Laplacian of 8-bit input (|v| <= 1020) at a quarter of CV_64F's bytes
+    lap = _cv2.Laplacian(gray, _cv2.CV_16S)
+    _, std = _cv2.meanStdDev(lap)
+    if isinstance(std, _cv2.UMat):  # UMat in -> UMat out on the OpenCL path
+        std = std.get()
+    return _sharpness_from_var(float(std[0, 0]) ** 2, scale)
+
+def _sharpness_from_var(var: float, scale: float = 1.0) -> float:
+    # shrinking steepens per-pixel edges and inflates the variance, so undo it
+    # (divide by the downscale factor squared) to keep scores resolution-independent
+    var *= scale * scale
     return float(1.0 - (1.0 / (1.0 + var / 100.0)))
 
-def detect_faces(img) -> int:
-    if not _ensure_cv2() or not _HAAR_PATH:
+def light_and_sharpness(gray, scale: float = 1.0) -> tuple:
+    """
+    (brightness_score, sharpness_score) of a gray image. Uses the fused numba
+    kernel (one pass for both) when available, else the two OpenCV passes.
+    """
+    if _fused_stats is not None:
+        mean, var = _fused_stats(gray)
+        return mean / 255.0, _sharpness_from_var(var, scale)
+    return brightness_score(gray), sharpness_score(gray, scale)
+
+def detect_faces(gray, bgr=None) -> int:
+    """
+    Count faces. Uses the YuNet CNN on the colour image when a model is configured
+    and `bgr` is given, else the Haar cascade on `gray`.
+    """
+    if bgr is not None and _YUNET_PATH:
+        try:
+            detector = _yunet()
+            h, w = bgr.shape[:2]
+            detector.setInputSize((w, h))
+            _, faces = detector.detect(bgr)
+            return 0 if faces is None else int(len(faces))
+        except Exception as e:
+            logger.debug("YuNet detect error, falling back to Haar: %s", e)
+    if not _HAAR_PATH:
         return 0
     try:
-        cascade = _cv2.CascadeClassifier(_HAAR_PATH)
-        if cascade.empty():
-            # failed to load cascade
-            logger.debug("Haar cascade failed to load from %s", _HAAR_PATH)
-            return 0
-        gray = _cv2.cvtColor(img, _cv2.COLOR_BGR2GRAY)
-        faces = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+        faces = _cascade().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
         return int(len(faces))
     except Exception as e:
         logger.debug("detect_faces error: %s", e)
@@ -92,28 +289,112 @@ def detect_faces(img) -> int:
 
 def tags_from_caption(caption: str) -> List[str]:
     caption = (caption or "").lower()
+    if _CAPTION_AUTOMATON is not None:
+        # one scan for all keywords; sort by rank to keep the table's tag order
+        ranks = {r for _, rs in _CAPTION_AUTOMATON.iter(caption) for r in rs}
+        return [_CAPTION_KEYWORDS[r][0] for r in sorted(ranks)]
     tags = []
-    mapping = {
-        "food": ["food", "pizza", "sushi", "delicious"],
-        "travel": ["travel", "beach", "vacation", "trip", "sea"],
-        "fashion": ["fashion", "style", "ootd"],
-        "fitness": ["gym", "workout", "fitness", "fit"],
-        "nature": ["sunset", "sunrise", "mountain", "sky"]
-    }
-    for tag, kws in mapping.items():
+    for tag, kws in _CAPTION_KEYWORDS:
         if any(k in caption for k in kws):
             tags.append(tag)
     return tags
 
-def analyze_image(path: str | None, caption: str = "") -> Dict:
+def _header_max_edge(data: bytes) -> int:
+    """Longest edge from the image header (no pixel decode); 0 if unknown."""
+    if _PILImage is None:
+        return 0
+    try:
+        with _PILImage.open(io.BytesIO(data)) as im:
+            return max(im.size)
+    except Exception:
+        return 0
+
+def _read_reduced(data: bytes):
+    """
+    Decode encoded image bytes, letting libjpeg scale by 1/2 during decode when
+    the result still covers _MAX_EDGE.
+    Returns (img or None, scale relative to the original).
+    """
+    buf = _np.frombuffer(data, dtype=_np.uint8)
+    if _header_max_edge(data) >= 2 * _MAX_EDGE:
+        img = _cv2.imdecode(buf, _cv2.IMREAD_REDUCED_COLOR_2)
+        if img is not None:
+            return img, 0.5
+    # small (or unknown-size) originals: one full-resolution decode
+    return _cv2.imdecode(buf, _cv2.IMREAD_COLOR), 1.0
+
+def _compute_metrics(data: bytes):
+    """(light, quality, faces) for encoded image bytes, or None if they don't decode."""
+    img, scale = _read_reduced(data)
+    if img is None:
+        return None
+    if _use_opencl:
+        return _compute_metrics_opencl(img, scale)
+
+    # downsample once; every metric below runs on the small copy
+    h, w = img.shape[:2]
+    shrink = _MAX_EDGE / float(max(h, w))
+    if shrink < 1.0:
+        img = _cv2.resize(img, None, fx=shrink, fy=shrink, interpolation=_cv2.INTER_AREA)
+        scale *= shrink
+
+    # convert once and share the gray image with every metric
+    gray = _cv2.cvtColor(img, _cv2.COLOR_BGR2GRAY)
+    light, sharp = light_and_sharpness(gray, scale)
+    faces = detect_faces(gray, img)
+    quality = float((light + sharp) / 2.0)
+    return float(light), quality, int(faces)
+
+def _compute_metrics_opencl(img, scale: float):
+    """
+    _compute_metrics with the memory-bound pixel passes (resize, gray, mean,
+    Laplacian variance) on the OpenCL device via cv2.UMat; face detection runs
+    on host copies.
+    """
+    u_img = _cv2.UMat(img)
+    h, w = img.shape[:2]
+    shrink = _MAX_EDGE / float(max(h, w))
+    if shrink < 1.0:
+        u_img = _cv2.resize(u_img, None, fx=shrink, fy=shrink, interpolation=_cv2.INTER_AREA)
+        scale *= shrink
+    u_gray = _cv2.cvtColor(u_img, _cv2.COLOR_BGR2GRAY)
+    light = brightness_score(u_gray)
+    sharp = sharpness_score(u_gray, scale)
+    faces = detect_faces(u_gray.get(), u_img.get())
+    quality = float((light + sharp) / 2.0)
+    return float(light), quality, int(faces)
+
+def _image_metrics(data: bytes):
+    """
+    _compute_metrics memoized on a blake2b digest of the bytes: reposts and
+    carousel duplicates in a job are decoded and analyzed once.
     """
-    Analyze image at `path` (if available) and/or caption to return analysis dict:
+    # entries live for the whole process, so never compute (and cache) one
+    # before setup has finished; this waits on _setup_lock if it is running
+    if not _ensure_cv2():
+        return None
+    key = hashlib.blake2b(data, digest_size=16).digest()
+    with _metrics_lock:
+        if key in _metrics_cache:
+            _metrics_cache.move_to_end(key)
+            return _metrics_cache[key]
+    metrics = _compute_metrics(data)
+    with _metrics_lock:
+        _metrics_cache[key] = metrics
+        if len(_metrics_cache) > _METRICS_CACHE_SIZE:
+            _metrics_cache.popitem(last=False)
+    return metrics
+
+def analyze_image(image: bytes | str | None, caption: str = "") -> Dict:
+    """
+    Analyze `image` (encoded bytes already in memory, or a file path) and/or caption
+    to return analysis dict:
       { tags: [], vibe: str, lighting_score: float, quality_score: float, faces_count: int }
-    Falls back to caption-only analysis if cv2 is not available or file missing.
+    Falls back to caption-only analysis if cv2 is not available or the image is missing.
     """
     tags = tags_from_caption(caption)
 
-    if not path or not _ensure_cv2() or not os.path.exists(path):
+    if not image or not _ensure_cv2() or (isinstance(image, str) and not os.path.exists(image)):
         vibe = tags[0] if tags else "neutral"
         return {
             "tags": tags,
@@ -124,15 +405,13 @@ def analyze_image(path: str | None, caption: str = "") -> Dict:
         }
 
     try:
-        data = _np.fromfile(path, dtype=_np.uint8)
-        img = _cv2.imdecode(data, _cv2.IMREAD_COLOR)
-        if img is None:
+        if isinstance(image, str):
+            with open(image, "rb") as f:
+                image = f.read()
+        metrics = _image_metrics(image)
+        if metrics is None:
             return {"tags": tags, "vibe": "neutral", "lighting_score": 0.5, "quality_score": 0.5, "faces_count": 0}
-
-        light = brightness_score(img)
-        sharp = sharpness_score(img)
-        faces = detect_faces(img)
-        quality = float((light + sharp) / 2.0)
+        light, quality, faces = metrics
 
         if quality > 0.7 and light > 0.6:
             vibe = "aesthetic"
@@ -1,18 +1,22 @@
 # src/api/main.py
 import logging
+import orjson
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-# your startup instaloader init
-from src.instaloader_client import init_session
-
 # import routes module (router defined here)
 from src.api import routes
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("insta_scraper_api")
 
-app = FastAPI(title="Instagram Scraper API")
+class _ORJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson: straight to bytes, several times faster than stdlib json."""
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+app = FastAPI(title="Instagram Scraper API", default_response_class=_ORJSONResponse)
 
 # include the router so endpoints in src/api/routes.py are registered
 # note: this registers routes under /api/... (so POST /api/scrape)
@@ -31,6 +35,8 @@ app.add_middleware(
 def _on_startup():
     logger.info("App startup: initializing Instaloader session (if configured)...")
     try:
+        # your startup instaloader init (imported here so importing the app stays cheap)
+        from src.instaloader_client import init_session
         ok = init_session()
         if ok:
             logger.info("Instaloader session ready.")
@@ -39,6 +45,13 @@ def _on_startup():
     except Exception as e:
         logger.exception("Error initializing instaloader session at startup: %s", e)
 
+    try:
+        from src.common.db import ensure_indexes
+        ensure_indexes()
+        logger.info("Mongo indexes ensured.")
+    except Exception as e:
+        logger.exception("Error ensuring Mongo indexes at startup: %s", e)
+
 @app.get("/health")
 async def health():
     """Simple health check used by readiness/liveness probes."""
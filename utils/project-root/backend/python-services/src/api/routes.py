@@ -4,8 +4,10 @@ from fastapi.responses import JSONResponse
 from pydantic import ValidationError
 import logging
 
-from src.api.schemas import ScrapeRequest, ScrapeResponse
-from src.jobs import job_store, worker
+from src.api.schemas import JobStatus, ScrapeRequest, ScrapeResponse
+
+# job_store (Mongo) and worker (instaloader, OpenCV) are imported inside the
+# handlers so app startup and /health don't pay for them
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -16,6 +18,8 @@ def post_scrape(body: ScrapeRequest, background_tasks: BackgroundTasks):
     Trigger a scrape job. Creates a job doc in MongoDB and schedules the background worker.
     Returns immediately with job_id and status "queued".
     """
+    from src.jobs import job_store, task_queue
+
     # create job record
     try:
         job_id = job_store.create_job(body.username, posts=body.posts, analyze=body.analyze, sample=body.sample)
@@ -23,10 +27,14 @@ def post_scrape(body: ScrapeRequest, background_tasks: BackgroundTasks):
         logger.exception("Failed to create job for %s: %s", body.username, e)
         raise HTTPException(status_code=500, detail="Failed to create job")
 
-    # schedule background task
+    # schedule on the RQ worker pool if configured, else as an in-process background task
     try:
-        background_tasks.add_task(worker.run_job_background, job_id)
-        logger.info("Scheduled background job %s for username=%s", job_id, body.username)
+        if task_queue.enqueue_job(job_id):
+            logger.info("Enqueued job %s for username=%s", job_id, body.username)
+        else:
+            from src.jobs import worker
+            background_tasks.add_task(worker.run_job_background, job_id)
+            logger.info("Scheduled background job %s for username=%s", job_id, body.username)
     except Exception as e:
         # If scheduling fails, mark job failed
         logger.exception("Failed to schedule background job %s: %s", job_id, e)
@@ -35,11 +43,13 @@ def post_scrape(body: ScrapeRequest, background_tasks: BackgroundTasks):
 
     return {"job_id": job_id, "status": "queued"}
 
-@router.get("/jobs/{job_id}")
+@router.get("/jobs/{job_id}", response_model=JobStatus)
 def get_job(job_id: str):
     """
     Return job document (job_id, username, status, message, created_at, started_at, finished_at, params).
     """
+    from src.jobs import job_store
+
     job = job_store.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
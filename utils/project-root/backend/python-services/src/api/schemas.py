@@ -1,10 +1,13 @@
 # src/api/schemas.py
 from __future__ import annotations
 from typing import Optional, Any, Dict
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class ScrapeRequest(BaseModel):
+    # reject unknown keys and trim usernames during (compiled) validation
+    model_config = ConfigDict(extra="forbid", str_strip_whitespace=True)
+
     username: str = Field(..., description="Instagram username to scrape")
     posts: Optional[int] = Field(10, ge=1, description="How many recent posts to fetch")
     analyze: Optional[bool] = Field(True, description="Whether to run image analysis")
@@ -12,11 +15,15 @@ class ScrapeRequest(BaseModel):
 
 
 class ScrapeResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     job_id: str
     status: str
 
 
 class JobStatus(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     job_id: str
     username: str
     status: str
@@ -14,7 +14,16 @@ else:
 # Defaults
 PY_MONGO_URI = os.getenv("PY_MONGO_URI", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DB_NAME", "insta_scraper")
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,zlib")  # wire compression, in preference order
 MEDIA_TEMP_DIR = os.getenv("MEDIA_TEMP_DIR", "/tmp/insta_media")
+MEDIA_KEEP_FILES = os.getenv("MEDIA_KEEP_FILES", "0") in ("1", "true", "True")  # also write analyzed media to MEDIA_TEMP_DIR
+MAX_MEDIA_BYTES = int(os.getenv("MAX_MEDIA_BYTES", str(20 * 1024 * 1024)))  # larger media downloads are abandoned
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "10"))
 SAMPLE_DATA_DIR = os.getenv("SAMPLE_DATA_DIR", str(ROOT / "sample_data"))
 INSTALOADER_SESSION_FILE = os.getenv("INSTALOADER_SESSION_FILE", "")
+REDIS_URL = os.getenv("REDIS_URL", "")  # when set, jobs run on `rq worker` processes instead of in the API
+RQ_QUEUE_NAME = os.getenv("RQ_QUEUE_NAME", "scrape")
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", "600"))  # seconds, per RQ job
+USE_OPENCL = os.getenv("USE_OPENCL", "0") in ("1", "true", "True")  # run resize/gray/Laplacian via OpenCL (cv2.UMat)
+YUNET_MODEL_PATH = os.getenv("YUNET_MODEL_PATH", "")  # e.g. face_detection_yunet_2023mar(_int8).onnx; Haar is used without it
+ANALYZE_WORKERS = int(os.getenv("ANALYZE_WORKERS", "8"))  # posts downloaded/analyzed concurrently per job
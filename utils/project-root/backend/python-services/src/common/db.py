@@ -1,7 +1,7 @@
 # src/common/db.py
 import logging
 from pymongo import MongoClient
-from src.common.config import PY_MONGO_URI, DB_NAME
+from src.common.config import PY_MONGO_URI, DB_NAME, MONGO_COMPRESSORS
 
 _logger = logging.getLogger(__name__)
 
@@ -11,8 +11,19 @@ _db = None
 def get_client():
     global _client
     if _client is None:
-        _client = MongoClient(PY_MONGO_URI)
-        _logger.info("MongoClient connected to %s", PY_MONGO_URI)
+        # pool sized for the analysis thread pool; connect=False defers the
+        # handshake to the first operation; compressors the server or local
+        # libraries don't support are dropped during negotiation
+        _client = MongoClient(
+            PY_MONGO_URI,
+            maxPoolSize=32,
+            minPoolSize=4,
+            serverSelectionTimeoutMS=3000,
+            retryWrites=True,
+            compressors=MONGO_COMPRESSORS,
+            connect=False,
+        )
+        _logger.info("MongoClient configured for %s", PY_MONGO_URI)
     return _client
 
 def get_db():
@@ -23,3 +34,12 @@ def get_db():
 
 def get_collection(name: str):
     return get_db()[name]
+
+def ensure_indexes():
+    """
+    Create the unique lookup indexes the upserts/finds filter on (idempotent).
+    Without them every update_one / bulk upsert scans the whole collection.
+    """
+    get_collection("posts").create_index([("shortcode", 1)], unique=True)
+    get_collection("profiles").create_index([("username", 1)], unique=True)
+    get_collection("jobs").create_index([("job_id", 1)], unique=True)
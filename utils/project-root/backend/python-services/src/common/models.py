@@ -0,0 +1,27 @@
+# src/common/models.py
+"""
+Lightweight records passed between the scraper, storage and the job worker.
+They are converted to plain dicts only at the Mongo boundary (to_dict).
+"""
+from dataclasses import dataclass, fields
+
+@dataclass(slots=True)
+class Post:
+    shortcode: str | None
+    caption: str = ""
+    likes: int = 0
+    comments: int = 0
+    display_url: str | None = None
+    taken_at: str | None = None
+    is_video: bool = False
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Post":
+        """Build from a stored/sample post dict; unknown keys are ignored."""
+        return cls(**{k: d[k] for k in _POST_FIELDS if k in d})
+
+    def to_dict(self) -> dict:
+        # flat record: cheaper than dataclasses.asdict's recursive deep copy
+        return {k: getattr(self, k) for k in _POST_FIELDS}
+
+_POST_FIELDS = tuple(f.name for f in fields(Post))
@@ -8,11 +8,12 @@ Usage:
 """
 from __future__ import annotations
 import os
-import json
 import logging
 import time
-from typing import Tuple, List, Dict, Optional
+from typing import Tuple, Dict, Iterator, Optional
+import orjson
 from src.common import config
+from src.common.models import Post
 
 logger = logging.getLogger(__name__)
 
@@ -27,8 +28,8 @@ def _read_json_abs(path: str):
         path = os.path.abspath(path)
     if not os.path.exists(path):
         raise FileNotFoundError(f"Sample file not found: {path}")
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
 
 def init_session(timeout_seconds: int = 20) -> bool:
     """
@@ -92,9 +93,11 @@ def init_session(timeout_seconds: int = 20) -> bool:
     return False
 
 def fetch_profile_and_posts(username: str, posts_limit: int = 10, sample: bool = False,
-                            max_attempts: int = 4, backoff_base: float = 1.0) -> Tuple[Dict, List[Dict]]:
+                            max_attempts: int = 4, backoff_base: float = 1.0) -> Tuple[Dict, Iterator[Post]]:
     """
-    Returns (profile_dict, posts_list)
+    Returns (profile_dict, posts_iter)
+    - posts_iter yields Post records lazily, so callers can process each post while the
+      next is being scraped; scrape errors surface (as RuntimeError) while iterating
     - In sample mode, reads files from SAMPLE_DIR
     - Otherwise uses the global Instaloader instance _L (init_session should be called on startup)
     """
@@ -106,7 +109,7 @@ def fetch_profile_and_posts(username: str, posts_limit: int = 10, sample: bool =
         logger.info("Using sample data from %s", SAMPLE_DIR)
         profile = _read_json_abs(profile_path)
         posts = _read_json_abs(posts_path)
-        return profile, posts
+        return profile, (Post.from_dict(p) for p in posts)
 
     # Lazy import instaloader if needed
     try:
@@ -139,26 +142,45 @@ def fetch_profile_and_posts(username: str, posts_limit: int = 10, sample: bool =
         logger.exception("Instaloader error fetching profile: %s", e)
         raise RuntimeError(f"Instaloader error fetching profile: {e}")
 
+    profile = {
+        "username": profile_obj.username,
+        "full_name": profile_obj.full_name,
+        "profile_pic_url": getattr(profile_obj, "profile_pic_url", None),
+        "followers": getattr(profile_obj, "followers", 0),
+        "followees": getattr(profile_obj, "followees", 0),
+        "posts_count": getattr(profile_obj, "mediacount", 0),
+        "biography": getattr(profile_obj, "biography", "") or ""
+    }
+
+    return profile, _iter_posts(profile_obj, username, posts_limit, max_attempts, backoff_base, ConnectionException)
+
+def _iter_posts(profile_obj, username: str, posts_limit: int, max_attempts: int, backoff_base: float,
+                ConnectionException) -> Iterator[Post]:
+    """Yield up to posts_limit Post records, retrying on ConnectionException without re-yielding."""
     # Fetch posts with retry on ConnectionException
     attempt = 0
-    posts = []
+    yielded = 0
     while attempt < max_attempts:
         try:
-            count = 0
+            seen = 0
             for post in profile_obj.get_posts():
-                if count >= posts_limit:
+                if yielded >= posts_limit:
                     break
-                p = {
-                    "shortcode": getattr(post, "shortcode", None),
-                    "caption": getattr(post, "caption", "") or "",
-                    "likes": getattr(post, "likes", 0),
-                    "comments": getattr(post, "comments", 0),
-                    "display_url": (getattr(post, "url", None) or (post.get_display_url() if hasattr(post, "get_display_url") else None)),
-                    "taken_at": (post.date_utc.isoformat() if getattr(post, "date_utc", None) else None),
-                    "is_video": getattr(post, "is_video", False)
-                }
-                posts.append(p)
-                count += 1
+                seen += 1
+                if seen <= yielded:
+                    continue  # already yielded before a retry restarted the listing
+                yield Post(
+                    shortcode=getattr(post, "shortcode", None),
+                    caption=getattr(post, "caption", "") or "",
+                    likes=getattr(post, "likes", 0),
+                    comments=getattr(post, "comments", 0),
+                    display_url=(getattr(post, "url", None) or (post.get_display_url() if hasattr(post, "get_display_url") else None)),
+                    taken_at=(post.date_utc.isoformat() if getattr(post, "date_utc", None) else None),
+                    is_video=getattr(post, "is_video", False)
+                )
+                yielded += 1
+                if yielded >= posts_limit:
+                    break  # don't page in posts past the limit
             break  # success
         except ConnectionException as e:
             attempt += 1
@@ -173,15 +195,3 @@ def fetch_profile_and_posts(username: str, posts_limit: int = 10, sample: bool =
         except Exception as e:
             logger.exception("Unexpected error while iterating posts: %s", e)
             raise RuntimeError(f"Instaloader error fetching posts: {e}")
-
-    profile = {
-        "username": profile_obj.username,
-        "full_name": profile_obj.full_name,
-        "profile_pic_url": getattr(profile_obj, "profile_pic_url", None),
-        "followers": getattr(profile_obj, "followers", 0),
-        "followees": getattr(profile_obj, "followees", 0),
-        "posts_count": getattr(profile_obj, "mediacount", 0),
-        "biography": getattr(profile_obj, "biography", "") or ""
-    }
-
-    return profile, posts
@@ -0,0 +1,37 @@
+# src/jobs/task_queue.py
+"""
+Optional RQ (Redis Queue) integration.
+
+When REDIS_URL is configured, scrape jobs are enqueued for separate `rq worker`
+processes instead of running inside the API process via BackgroundTasks:
+
+    rq worker --url "$REDIS_URL" scrape
+
+get_queue() returns None when REDIS_URL is unset or rq/redis are unavailable.
+"""
+import functools
+import logging
+from src.common import config
+
+_logger = logging.getLogger(__name__)
+
+@functools.lru_cache(maxsize=1)
+def get_queue():
+    if not config.REDIS_URL:
+        return None
+    try:
+        from redis import Redis
+        from rq import Queue
+    except Exception as e:
+        _logger.warning("REDIS_URL is set but rq/redis failed to import (%s); running jobs in-process", e)
+        return None
+    return Queue(config.RQ_QUEUE_NAME, connection=Redis.from_url(config.REDIS_URL))
+
+def enqueue_job(job_id: str) -> bool:
+    """Enqueue worker.run_job_background(job_id) on RQ. Returns False if no queue is configured."""
+    queue = get_queue()
+    if queue is None:
+        return False
+    # referenced by import path so the API process never imports the worker stack
+    queue.enqueue("src.jobs.worker.run_job_background", job_id, job_timeout=config.JOB_TIMEOUT)
+    return True
@@ -1,23 +1,49 @@
 # src/jobs/worker.py
 import logging
 import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pymongo import UpdateOne
 from src.jobs import job_store
+from src.common import config
 from src.instaloader_client import fetch_profile_and_posts
 from src.common.db import get_collection
-from src.storage import download_media_for_post
-from src.analyzer.image_analysis import analyze_image
+from src.common.models import Post
 
 _logger = logging.getLogger(__name__)
 _profiles = get_collection("profiles")
 _posts = get_collection("posts")
 
+# Mongo upserts are flushed in batches of this size, so memory stays bounded
+# for large jobs while a typical job is still a single round-trip.
+_BULK_BATCH = 100
+
 def _now_iso():
     return datetime.utcnow().isoformat()
 
+def _process_one_post(p: Post) -> dict:
+    """Download + analyze one post; returns the fields to $set. Runs on the analysis pool."""
+    # only analyze jobs need the media/analysis stack
+    from src.storage import download_media_bytes
+    from src.analyzer.image_analysis import analyze_image
+
+    shortcode = p.shortcode
+    try:
+        # decoded straight from memory; no temp-file write + re-read per post
+        media = download_media_bytes(p)
+        analysis = analyze_image(media, caption=p.caption)
+    except Exception as e:
+        _logger.exception("Analysis error for %s: %s", shortcode, e)
+        analysis = {"tags": [], "vibe": "unknown", "lighting_score": 0.0, "quality_score": 0.0, "faces_count": 0}
+
+    return {"analysis": analysis, "analyzed_at": _now_iso()}
+
 def run_job_background(job_id: str):
     """
-    Background job executed by FastAPI BackgroundTasks.
+    Background job: runs on an `rq worker` process when enqueued through
+    task_queue.enqueue_job (REDIS_URL set), otherwise in the API process via
+    FastAPI BackgroundTasks.
     Updates job status in jobs collection.
     """
     try:
@@ -33,7 +59,7 @@ def run_job_background(job_id: str):
         analyze = params.get("analyze", True)
         sample = params.get("sample", False)
 
-        # fetch profile & posts (metadata only)
+        # fetch profile; posts arrive lazily while earlier ones are downloaded/analyzed
         profile, posts = fetch_profile_and_posts(username, posts_limit, sample=sample)
 
         # upsert profile
@@ -43,30 +69,35 @@ def run_job_background(job_id: str):
             upsert=True
         )
 
-        # upsert posts metadata
-        for p in posts:
-            key = {"shortcode": p.get("shortcode")}
-            _posts.update_one(
-                key,
-                {"$set": {**p, "username": profile["username"], "scraped_at": _now_iso()}},
+        # single pass: each post is submitted for analysis (if requested) as it is scraped;
+        # downloads are I/O-bound and OpenCV releases the GIL, so posts run concurrently.
+        # At most 2 x ANALYZE_WORKERS posts are in flight, so scraping can't run ahead unbounded.
+        max_in_flight = 2 * max(1, config.ANALYZE_WORKERS)
+        pending = deque()
+        ops = []
+
+        def _finish_oldest():
+            p, future = pending.popleft()
+            analysis = future.result() if future is not None else {}
+            # metadata + analysis in one upsert per post
+            ops.append(UpdateOne(
+                {"shortcode": p.shortcode},
+                {"$set": {**p.to_dict(), "username": profile["username"], "scraped_at": _now_iso(), **analysis}},
                 upsert=True
-            )
+            ))
+            if len(ops) >= _BULK_BATCH:
+                _posts.bulk_write(ops, ordered=False)
+                ops.clear()
 
-        # perform analysis if requested
-        if analyze:
+        with ThreadPoolExecutor(max_workers=max(1, config.ANALYZE_WORKERS)) as ex:
             for p in posts:
-                shortcode = p.get("shortcode")
-                try:
-                    local_path = download_media_for_post(p)
-                    analysis = analyze_image(local_path, caption=p.get("caption", ""))
-                except Exception as e:
-                    _logger.exception("Analysis error for %s: %s", shortcode, e)
-                    analysis = {"tags": [], "vibe": "unknown", "lighting_score": 0.0, "quality_score": 0.0, "faces_count": 0}
-
-                _posts.update_one(
-                    {"shortcode": shortcode},
-                    {"$set": {"analysis": analysis, "analyzed_at": _now_iso()}}
-                )
+                pending.append((p, ex.submit(_process_one_post, p) if analyze else None))
+                if len(pending) >= max_in_flight:
+                    _finish_oldest()
+            while pending:
+                _finish_oldest()
+        if ops:
+            _posts.bulk_write(ops, ordered=False)
 
         job_store.update_job(job_id, status="completed", finished_at=_now_iso(), message="Job completed")
         _logger.info("Job %s completed", job_id)
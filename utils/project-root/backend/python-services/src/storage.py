@@ -1,41 +1,66 @@
 # src/storage.py
 """
-Media download helper. Downloads a media URL (display_url) to a temp dir specified in config.MEDIA_TEMP_DIR.
-Returns local path or None on failure.
+Media download helpers.
+- download_media_bytes: fetch a post's display_url into memory (what the worker analyzes).
+Returns None on failure, including media over config.MAX_MEDIA_BYTES.
 """
 import os
 import uuid
 import logging
 from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from src.common import config
+from src.common.models import Post
 
 logger = logging.getLogger(__name__)
-os.makedirs(config.MEDIA_TEMP_DIR, exist_ok=True)
 
-def download_media_for_post(post: dict, timeout: int | None = None) -> str | None:
+# One pooled keep-alive session: a job's media all comes from the same CDN hosts,
+# so every download after the first skips the TCP+TLS handshake.
+# Pool size covers the worker's concurrent downloads (config.ANALYZE_WORKERS).
+_SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=max(16, config.ANALYZE_WORKERS),
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+)
+_SESSION.mount("http://", _adapter)
+_SESSION.mount("https://", _adapter)
+
+def _media_path(post: Post, url: str) -> str:
+    ext = os.path.splitext(urlparse(url).path)[1] or ".jpg"
+    fname = f"{post.shortcode or uuid.uuid4()}{ext}"
+    return os.path.join(config.MEDIA_TEMP_DIR, fname)
+
+def download_media_bytes(post: Post, timeout: int | None = None) -> bytes | None:
     """
-    Download display_url -> local file path
-    post: dict with 'display_url' and 'shortcode' keys
-    Returns path or None
+    Download display_url -> bytes held in memory (no temp file).
+    The file is also written to MEDIA_TEMP_DIR when config.MEDIA_KEEP_FILES is set.
+    Returns bytes or None
     """
-    url = post.get("display_url")
+    url = post.display_url
     if not url:
         return None
     timeout = timeout or config.REQUEST_TIMEOUT
     try:
-        resp = requests.get(url, stream=True, timeout=timeout)
-        resp.raise_for_status()
-        ext = os.path.splitext(urlparse(url).path)[1] or ".jpg"
-        fname = f"{post.get('shortcode') or uuid.uuid4()}{ext}"
-        path = os.path.join(config.MEDIA_TEMP_DIR, fname)
-        with open(path, "wb") as f:
-            for chunk in resp.iter_content(1024 * 32):
-                if not chunk:
-                    break
-                f.write(chunk)
-        logger.info("Downloaded media for %s -> %s", post.get("shortcode"), path)
-        return path
+        with _SESSION.get(url, stream=True, timeout=timeout) as resp:
+            resp.raise_for_status()
+            length = resp.headers.get("Content-Length", "")
+            if length.isdigit() and int(length) > config.MAX_MEDIA_BYTES:
+                raise ValueError(f"response too large: {length} bytes (limit {config.MAX_MEDIA_BYTES})")
+            buf = bytearray()
+            for chunk in resp.iter_content(1024 * 64):
+                buf += chunk
+                if len(buf) > config.MAX_MEDIA_BYTES:
+                    raise ValueError(f"response too large: over {config.MAX_MEDIA_BYTES} bytes")
+        data = buf  # bytes-like is all analyze_image needs; skip the bytes() copy
+        if config.MEDIA_KEEP_FILES:
+            os.makedirs(config.MEDIA_TEMP_DIR, exist_ok=True)
+            with open(_media_path(post, url), "wb") as f:
+                f.write(data)
+        logger.info("Downloaded media for %s (%d bytes)", post.shortcode, len(data))
+        return data
     except Exception as e:
         logger.debug("Failed to download media %s: %s", url, e)
         return None